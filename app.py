@@ -1,30 +1,125 @@
 import streamlit as st
-from openai import OpenAI
-import instructor
-import os
-import base64
-from PIL import Image
+import pybase64
+import hashlib
+import json
 import io
-import re
+from pathlib import Path
 import random
-from typing import List, Optional, Union
-from pydantic import BaseModel, Field, field_validator
+from typing import Annotated, List, Optional, Sequence, Union
+from pydantic import BaseModel, ConfigDict, Field, StringConstraints, ValidationError, field_validator
 from enum import Enum
+from functools import cached_property
+from itertools import islice
 import concurrent.futures
 import time
 
-def image_to_base64(image_file) -> str:
-    """Convert uploaded image to base64"""
-    return base64.b64encode(image_file.read()).decode("utf-8")
+# Read size for streaming base64; a multiple of 3 so no padding lands between chunks
+BASE64_CHUNK_SIZE = 57 * 1024
 
-# Initialize OpenAI client with instructor using Streamlit secrets
+def image_to_data_url(image_file, mime: str = "image/jpeg") -> str:
+    """Convert an image to a base64 data URL, encoding it chunk by chunk"""
+    # In-memory files are encoded straight from their buffer, without copying the bytes out
+    if hasattr(image_file, 'getbuffer'):
+        data = image_file.getbuffer()
+    else:
+        if hasattr(image_file, 'seek'):
+            image_file.seek(0)
+        data = memoryview(image_file.read())
+    # Prefix and encoded chunks go into one buffer, so the URL is materialized only once
+    out = io.StringIO()
+    out.write(f"data:{mime};base64,")
+    with data:
+        for start in range(0, len(data), BASE64_CHUNK_SIZE):
+            out.write(pybase64.b64encode(data[start:start + BASE64_CHUNK_SIZE]).decode("ascii"))
+    return out.getvalue()
+
+# Longest image side sent to the model; larger photos only add upload size and image tokens
+MAX_IMAGE_SIDE = 1536
+
+def prepare_image(image_file) -> str:
+    """Downscale an image and re-encode it as JPEG, returning its data URL"""
+    from PIL import Image, ImageOps
+    
+    if hasattr(image_file, 'seek'):
+        image_file.seek(0)
+    # Apply the EXIF orientation before re-encoding drops the metadata
+    img = ImageOps.exif_transpose(Image.open(image_file))
+    img.thumbnail((MAX_IMAGE_SIDE, MAX_IMAGE_SIDE), Image.LANCZOS)
+    
+    # JPEG has no alpha, and a plain convert("RGB") turns transparent pixels black,
+    # hiding dark ink on a transparent PNG, so flatten onto white first
+    if img.mode in ("RGBA", "LA", "PA") or (img.mode == "P" and "transparency" in img.info):
+        rgba = img.convert("RGBA")
+        img = Image.new("RGB", rgba.size, (255, 255, 255))
+        img.paste(rgba, mask=rgba.getchannel("A"))
+    
+    buf = io.BytesIO()
+    img.convert("RGB").save(buf, "JPEG", quality=85, optimize=True)
+    return image_to_data_url(buf)
+
+@st.cache_data(show_spinner=False)
+def _thumbnail_png(file_bytes: bytes, max_side: int = 512) -> bytes:
+    """Decode an image once and return a small PNG preview of it"""
+    from PIL import Image, ImageOps
+    
+    img = ImageOps.exif_transpose(Image.open(io.BytesIO(file_bytes)))
+    img.thumbnail((max_side, max_side))
+    # PNG can't store modes like CMYK (common in scans) or YCbCr
+    if img.mode not in ("1", "L", "LA", "I", "I;16", "P", "RGB", "RGBA"):
+        img = img.convert("RGB")
+    buf = io.BytesIO()
+    img.save(buf, "PNG")
+    return buf.getvalue()
+
+@st.cache_resource(show_spinner=False)
+def _load_default_image() -> bytes:
+    """Read the bundled sample image (A.jpg) once per server process"""
+    return Path("A.jpg").read_bytes()
+
+# Read the OpenAI API key from Streamlit secrets
 try:
     api_key = st.secrets["openai"]["api_key"]
 except KeyError:
     st.error("❌ OpenAI API key not found! Please configure it in Streamlit secrets.")
     st.stop()
 
-client = instructor.from_openai(OpenAI(api_key=api_key))
+# The SDKs are imported on first use rather than at startup, then kept for the process
+@st.cache_resource(show_spinner=False)
+def _get_openai_client():
+    """Plain OpenAI client, used for the Batch API"""
+    from openai import OpenAI
+    return OpenAI(api_key=api_key)
+
+@st.cache_resource(show_spinner=False)
+def _get_client():
+    """instructor-patched client for structured, streamed responses"""
+    import instructor
+    return instructor.from_openai(_get_openai_client())
+
+QUIZ_MODEL = "gpt-4o"
+
+# Upper bound on OpenAI requests in flight at once, across all sessions
+MAX_CONCURRENT_REQUESTS = 16
+# Images sent together in one vision request; each request returns one quiz per image
+IMAGES_PER_REQUEST = 4
+# Output budget per image: 8-12 questions including a 150-250 character reading text
+MAX_TOKENS_PER_IMAGE = 2048
+# Seconds between progress updates while quiz responses are streaming in
+PROGRESS_POLL_INTERVAL = 0.5
+
+# Seconds between status checks of a submitted Batch API job
+BATCH_POLL_INTERVAL = 30
+
+# Fallback wrong meanings used to pad multiple choice options. All entries are
+# lowercase, so they can be compared directly against lowercased meanings.
+BACKUP_WRONG_MEANINGS = ("học sinh", "giáo viên", "bạn bè", "gia đình", "thời gian", "từ khác")
+COMMON_WRONG_MEANINGS = (
+    "học sinh", "giáo viên", "bạn bè", "gia đình", "cuộc sống",
+    "công việc", "thời gian", "nhà cửa", "tình yêu", "thức ăn",
+    "nước uống", "sức khỏe", "tiền bạc", "giao thông", "du lịch",
+    "đi lại", "ngôn ngữ", "học tập", "tình cảm", "hạnh phúc"
+)
+GENERIC_WRONG_MEANINGS = ("từ khác", "nghĩa khác", "không có nghĩa này", "nghĩa sai")
 
 # Pydantic Models for structured data
 class QuestionType(str, Enum):
@@ -35,15 +130,25 @@ class QuestionType(str, Enum):
     DIALOGUE_ARRANGEMENT = "dialogue_arrangement"
     READING_COMPREHENSION = "reading_comprehension"
     CHINESE_TO_PINYIN_MEANING = "chinese_to_pinyin_meaning"
+    # Placeholder for images that could not be turned into a quiz
+    ERROR = "error"
+
+# Stripped, non-empty text; checked inside pydantic-core instead of a Python validator
+NonEmptyStr = Annotated[str, StringConstraints(strip_whitespace=True, min_length=1)]
 
 class QuizQuestion(BaseModel):
     """Structured representation of a quiz question"""
+    # Questions nested in QuizData are taken as-is rather than copied and revalidated,
+    # and combine_quizzes' in-place id/wrong_meanings updates are plain attribute writes;
+    # type is stored as its plain string value so comparisons with literals keep working
+    model_config = ConfigDict(revalidate_instances='never', validate_assignment=False, use_enum_values=True)
+    
     id: int = Field(..., description="Question ID")
-    type: str = Field(..., description="Question type/category")
-    question: str = Field(..., description="The question text")
-    chinese_word: str = Field(..., description="The Chinese word/character")
-    pinyin: str = Field(..., description="Pinyin pronunciation")
-    meaning: str = Field(..., description="Vietnamese/English meaning")
+    type: QuestionType = Field(..., description="Question type/category")
+    question: NonEmptyStr = Field(..., description="The question text")
+    chinese_word: NonEmptyStr = Field(..., description="The Chinese word/character")
+    pinyin: NonEmptyStr = Field(..., description="Pinyin pronunciation")
+    meaning: NonEmptyStr = Field(..., description="Vietnamese/English meaning")
     wrong_meanings: List[str] = Field(default=[], description="Wrong meaning options for multiple choice")
     explanation: Optional[str] = Field(default="", description="Additional explanation")
     
@@ -63,32 +168,15 @@ class QuizQuestion(BaseModel):
     subanswers: List[str] = Field(default=[], description="Answers to the subquestions")
     suboptions: List[List[str]] = Field(default=[], description="Options for each subquestion")
     
-    @field_validator('question')
-    def question_must_not_be_empty(cls, v):
-        if not v or not v.strip():
-            raise ValueError('Question text cannot be empty')
-        return v.strip()
-    
-    @field_validator('chinese_word')
-    def chinese_word_must_not_be_empty(cls, v):
-        if not v or not v.strip():
-            raise ValueError('Chinese word cannot be empty')
-        return v.strip()
-    
-    @field_validator('pinyin')
-    def pinyin_must_not_be_empty(cls, v):
-        if not v or not v.strip():
-            raise ValueError('Pinyin cannot be empty')
-        return v.strip()
-    
-    @field_validator('meaning')
-    def meaning_must_not_be_empty(cls, v):
-        if not v or not v.strip():
-            raise ValueError('Meaning cannot be empty')
-        return v.strip()
-    
-    @field_validator('wrong_meanings')
+    @field_validator('wrong_meanings', mode='before')
     def validate_wrong_meanings(cls, v):
+        # Tuples are accepted by list[str] validation too, so clean them the same way
+        if isinstance(v, tuple):
+            v = list(v)
+        # Leave empty or non-string input to the regular list[str] validation
+        if not v or not isinstance(v, list) or not all(isinstance(m, str) for m in v):
+            return v
+        
         # Clean up wrong meanings and remove duplicates
         cleaned_meanings = []
         seen = set()
@@ -99,28 +187,79 @@ class QuizQuestion(BaseModel):
                 seen.add(meaning_clean.lower())
         return cleaned_meanings
     
-    @property
+    @cached_property
+    def pinyin_normalized(self) -> str:
+        """Lowercased pinyin for answer checks (already stripped by validation)"""
+        return self.pinyin.lower()
+    
+    @cached_property
     def all_meaning_options(self) -> List[str]:
-        """Get all meaning options (correct + wrong) shuffled"""
+        """Get the correct meaning plus three wrong ones in a stable shuffled order
+        
+        Options are sorted by a hash of (question id, option), so the order is a pure
+        function of the question and survives reruns without any session state.
+        """
+        wrong = self.wrong_meanings[:3]
         # Ensure we always have at least 3 wrong meanings
-        if len(self.wrong_meanings) < 3:
-            backup_options = ["học sinh", "giáo viên", "bạn bè", "gia đình", "thời gian", "từ khác"]
-            additional_options = []
-            for option in backup_options:
-                if len(self.wrong_meanings) + len(additional_options) >= 3:
+        if len(wrong) < 3:
+            taken = {m.lower() for m in wrong}
+            taken.add(self.meaning.lower())
+            for option in BACKUP_WRONG_MEANINGS:
+                if len(wrong) >= 3:
                     break
-                if option.lower() not in [m.lower() for m in self.wrong_meanings] and option.lower() != self.meaning.lower():
-                    additional_options.append(option)
-            
-            # Create and shuffle options
-            options = [self.meaning] + self.wrong_meanings + additional_options
-        else:
-            options = [self.meaning] + self.wrong_meanings
+                if option not in taken:
+                    wrong.append(option)
+                    taken.add(option)
+        
+        return sorted(
+            [self.meaning, *wrong],
+            key=lambda option: hashlib.blake2b(f"{self.id}|{option}".encode("utf-8"), digest_size=8).digest()
+        )
+
+    @cached_property
+    def text_block(self) -> str:
+        """Plain-text export of this question after its header line, formatted once"""
+        parts = [
+            f"Type: {self.type}\n"
+            f"Chinese Word: {self.chinese_word}\n"
+            f"Question: {self.question}\n"
+            f"Correct Pinyin: {self.pinyin}\n"
+            f"Correct Meaning: {self.meaning}\n"
+        ]
+        
+        # Type-specific fields
+        if self.type == "chinese_to_pinyin_meaning":
+            parts.append(f"Wrong Options: {', '.join(self.wrong_meanings)}\n")
+        
+        elif self.type == "gap_filling":
+            parts.append(
+                f"Context Sentence: {self.context_sentence}\n"
+                f"Options: {', '.join(self.options)}\n"
+                f"Correct Answer: {self.correct_answer}\n"
+                f"HSK Level: {self.hsk_level}\n"
+            )
+        
+        elif self.type == "dialogue_arrangement":
+            parts.append("Dialogue Parts:\n")
+            parts.extend(f"  Part {j}: {part}\n" for j, part in enumerate(self.dialogue_parts, 1))
+            parts.append(f"Correct Order: {self.correct_order}\n")
+        
+        elif self.type == "reading_comprehension":
+            parts.append(f"Reading Text:\n{self.reading_text}\n\nSubquestions:\n")
+            for j, (subq, ans) in enumerate(zip(self.subquestions, self.subanswers)):
+                parts.append(f"  {j+1}. {subq}\n     Answer: {ans}\n")
+                if j < len(self.suboptions):
+                    parts.append(f"     Options: {', '.join(self.suboptions[j])}\n")
+        
+        if self.explanation:
+            parts.append(f"Explanation: {self.explanation}\n")
         
-        random.shuffle(options)
-        return options
+        parts.append("-" * 40 + "\n")
+        return "".join(parts)
 
 class QuizData(BaseModel):
+    model_config = ConfigDict(revalidate_instances='never')
+    
     questions: List[QuizQuestion] = Field(default=[], description="List of quiz questions")
     title: Optional[str] = Field(default="Quiz", description="Quiz title")
 
@@ -140,129 +279,280 @@ class QuizData(BaseModel):
         return None
 
 
-def generate_single_quiz(image_file, image_index):
-    """Generate quiz from a single image - helper function for parallel processing"""
+class BatchQuizData(BaseModel):
+    """Quizzes for several images sent in one request, one per image in order"""
+    model_config = ConfigDict(revalidate_instances='never')
+    
+    batch: List[QuizData] = Field(..., description="One quiz per image, in the same order as the images")
+
+
+# Instruction sent first in every request. Kept byte-identical across requests so OpenAI's
+# prompt caching can reuse it; bump _QUIZ_PROMPT_VERSION to invalidate cached quizzes
+# without editing the text.
+_QUIZ_PROMPT_VERSION = 2
+_QUIZ_PROMPT = (
+    "Bạn là giáo viên tiếng Trung. Đây là ảnh chụp một trang ghi chú gồm từ Hán, pinyin, loại từ, và nghĩa tiếng Việt. "
+    "Hãy tạo 8-12 câu hỏi quiz với các dạng bài tập khác nhau: "
+    "- Dạng 1: Hiển thị từ tiếng Trung → Học sinh điền pinyin + chọn nghĩa đúng (4-6 câu)"
+    "- Dạng 2: Điền từ vào chỗ trống, sử dụng từ vựng ở HSK level 4 (1-2 câu)"
+    "- Dạng 3: Sắp xếp hội thoại theo thứ tự đúng (0-1 câu)"
+    "- Dạng 4: Đọc hiểu văn bản ngắn và trả lời câu hỏi (0-1 câu)"
+    "Trả về dữ liệu có cấu trúc với: "
+    "- title: tên bài quiz (dựa trên nội dung ảnh) "
+    "- questions: danh sách câu hỏi, mỗi câu có các trường tùy theo loại câu hỏi: "
+    ""
+    "1. Đối với câu hỏi pinyin và nghĩa (type: 'chinese_to_pinyin_meaning'):"
+    "  * id: số thứ tự "
+    "  * type: 'chinese_to_pinyin_meaning' "
+    "  * question: câu hỏi dạng 'Pinyin và nghĩa của từ [từ tiếng Trung] là gì?' "
+    "  * chinese_word: từ tiếng Trung (hiển thị cho học sinh) "
+    "  * pinyin: cách đọc pinyin đúng "
+    "  * meaning: nghĩa tiếng Việt đúng "
+    "  * wrong_meanings: 3-4 nghĩa sai để tạo multiple choice "
+    ""
+    "2. Đối với câu hỏi điền vào chỗ trống (type: 'gap_filling'):"
+    "  * id: số thứ tự"
+    "  * type: 'gap_filling'"
+    "  * question: Câu hỏi dạng 'Chọn từ phù hợp để điền vào chỗ trống'"
+    "  * context_sentence: Câu hoàn chỉnh với '___ ' là chỗ cần điền"
+    "  * options: 4 lựa chọn từ để điền"
+    "  * correct_answer: Từ đúng để điền vào chỗ trống"
+    "  * chinese_word: Từ đúng để điền (giống correct_answer)"
+    "  * pinyin: Pinyin của từ đúng"
+    "  * meaning: Nghĩa của từ đúng"
+    "  * hsk_level: 4 (hoặc cấp độ HSK của từ vựng)"
+    ""
+    "3. Đối với câu hỏi sắp xếp hội thoại (type: 'dialogue_arrangement'):"
+    "  * id: số thứ tự"
+    "  * type: 'dialogue_arrangement'"
+    "  * question: 'Sắp xếp các phần của hội thoại theo thứ tự đúng'"
+    "  * dialogue_parts: Mảng các phần của hội thoại (3-5 phần)"
+    "  * correct_order: Mảng các số nguyên thể hiện thứ tự đúng [0, 1, 2, ...]"
+    "  * chinese_word: Chủ đề của hội thoại"
+    "  * pinyin: Pinyin của chủ đề"
+    "  * meaning: Nghĩa của chủ đề"
+    ""
+    "4. Đối với câu hỏi đọc hiểu (type: 'reading_comprehension'):"
+    "  * id: số thứ tự"
+    "  * type: 'reading_comprehension'"
+    "  * question: '阅读理解 (Đọc hiểu)'"
+    "  * reading_text: Nội dung đoạn văn dài (150-250 từ) bằng tiếng Trung (HSK 4-5), có thể có đoạn văn đối thoại hoặc văn xuôi"
+    "  * subquestions: Mảng các câu hỏi con bằng tiếng Trung về nội dung đoạn văn (2-4 câu hỏi)"
+    "  * suboptions: Mảng các mảng lựa chọn bằng tiếng Trung cho từng câu hỏi con"
+    "  * subanswers: Mảng các đáp án đúng cho từng câu hỏi con"
+    "  * chinese_word: Tiêu đề của đoạn văn"
+    "  * pinyin: Pinyin của tiêu đề"
+    "  * meaning: Nghĩa của tiêu đề"
+    "  * explanation: Giải thích các từ khó hoặc ngữ pháp phức tạp trong bài đọc"
+    "  * explanation: giải thích thêm về từ (nếu có) "
+    "Lưu ý quan trọng:"
+    "1. Mỗi câu hỏi phải có wrong_meanings riêng biệt, không được sử dụng lại wrong_meanings ở các câu khác"
+    "2. Các nghĩa sai phải khác hoàn toàn với nghĩa đúng"
+    "3. Hãy tạo nghĩa sai liên quan đến ngữ cảnh của từ, không chỉ chọn nghĩa ngẫu nhiên"
+    "4. Tránh sử dụng lại các nghĩa sai giống nhau ở các câu hỏi khác nhau"
+)
+
+def _build_messages(images: List[str]) -> list:
+    """Build the chat messages asking the model for one quiz per notes image
+    
+    `images` holds data URLs as returned by prepare_image.
+    """
+    content = [{"type": "text", "text": _QUIZ_PROMPT}]
+    for i, data_url in enumerate(images, 1):
+        content.append({"type": "text", "text": f"Ảnh {i}:"})
+        content.append({
+            "type": "image_url",
+            "image_url": {
+                "url": data_url
+            }
+        })
+    content.append({
+        "type": "text",
+        "text": f"Có {len(images)} ảnh. Trả về batch gồm đúng {len(images)} quiz, mỗi ảnh một quiz, theo đúng thứ tự ảnh."
+    })
+    return [{"role": "user", "content": content}]
+
+
+def _error_quiz(image_index: int, message: str) -> QuizData:
+    """Create a placeholder quiz reporting that an image could not be processed"""
+    error_question = QuizQuestion(
+        id=1,
+        type="error",
+        question=f"Lỗi khi tạo quiz từ ảnh {image_index+1}: {message}",
+        chinese_word="N/A",
+        pinyin="N/A",
+        meaning="N/A",
+        wrong_meanings=[]
+    )
+    return QuizData(questions=[error_question], title=f"Lỗi - Ảnh {image_index+1}")
+
+
+def _chunk_images(image_files) -> list:
+    """Split images into the groups sent together in one request"""
+    return [image_files[i:i + IMAGES_PER_REQUEST] for i in range(0, len(image_files), IMAGES_PER_REQUEST)]
+
+
+def _validate_quizzes(items: list, num_images: int) -> List[Union[QuizData, str]]:
+    """Validate the model's raw quizzes one by one, so a bad quiz only fails its own image
+    
+    Each entry is the image's QuizData, or an error message if the quiz was
+    invalid or left out.
+    """
+    quizzes = []
+    for i in range(num_images):
+        if i >= len(items):
+            quizzes.append("không nhận được quiz cho ảnh này")
+            continue
+        try:
+            quizzes.append(QuizData.model_validate(items[i]))
+        except ValidationError as e:
+            quizzes.append(str(e))
+    return quizzes
+
+
+def _with_error_quizzes(results: List[Union[QuizData, str]], first_index: int) -> List[QuizData]:
+    """Replace the error messages among per-image results with error quizzes"""
+    return [
+        result if isinstance(result, QuizData) else _error_quiz(first_index + i, result)
+        for i, result in enumerate(results)
+    ]
+
+
+# Fingerprint of the prompt, so editing it or bumping its version invalidates cached quizzes
+_PROMPT_FINGERPRINT = hashlib.sha256(f"{_QUIZ_PROMPT_VERSION}\n{_QUIZ_PROMPT}".encode("utf-8")).digest()
+
+
+@st.cache_data(ttl=86400, max_entries=256, show_spinner=False)
+def _cached_generate(cache_key: str, _images: tuple, _on_questions=None) -> tuple[List[Union[QuizData, str]], bool]:
+    """Call the model for a group of images, memoized on their content hashes
+
+    Only `cache_key` takes part in Streamlit's cache lookup; the raw image bytes
+    and the progress callback are skipped. The response is streamed, and
+    `_on_questions` is called with the number of questions received so far.
+    
+    Returns one entry per image, its QuizData or an error message, and whether
+    the model's answer was complete; callers drop incomplete results from the cache.
+    """
+    results = [None] * len(_images)
+    # Images that can't be decoded fail on their own and are left out of the request
+    prepared = []
+    for offset, image_bytes in enumerate(_images):
+        try:
+            prepared.append((offset, prepare_image(io.BytesIO(image_bytes))))
+        except Exception as e:
+            results[offset] = str(e)
+    if not prepared:
+        return results, True
+    
+    stream = _get_client().chat.completions.create_partial(
+        model=QUIZ_MODEL,
+        temperature=0.7,
+        max_tokens=MAX_TOKENS_PER_IMAGE * len(prepared),
+        response_model=BatchQuizData,
+        messages=_build_messages([data_url for _, data_url in prepared])
+    )
+    batch = None
+    for batch in stream:
+        if _on_questions is not None:
+            _on_questions(sum(len(quiz.questions or []) for quiz in batch.batch or []))
+    
+    # The last partial is the complete response; each quiz in it is validated separately
+    items = (batch.model_dump(exclude_unset=True).get("batch") or []) if batch is not None else []
+    quizzes = _validate_quizzes(items, len(prepared))
+    for (offset, _), quiz in zip(prepared, quizzes):
+        results[offset] = quiz
+    return results, all(isinstance(quiz, QuizData) for quiz in quizzes)
+
+
+def generate_quiz_chunk(image_files, first_index, progress=None):
+    """Generate one quiz per image for a group of images sent in a single request
+    
+    If `progress` is a dict, the number of questions streamed so far for this
+    chunk is kept in it under `first_index`.
+    """
     try:
-        # Reset file pointer if needed
-        if hasattr(image_file, 'seek'):
-            image_file.seek(0)
-            
-        base64_img = image_to_base64(image_file)
-        
-        quiz_data = client.chat.completions.create(
-            model="gpt-4o",
-            temperature=0.7,
-            max_tokens=2048,
-            response_model=QuizData,
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": (
-                                "Bạn là giáo viên tiếng Trung. Đây là ảnh chụp một trang ghi chú gồm từ Hán, pinyin, loại từ, và nghĩa tiếng Việt. "
-                                "Hãy tạo 8-12 câu hỏi quiz với các dạng bài tập khác nhau: "
-                                "- Dạng 1: Hiển thị từ tiếng Trung → Học sinh điền pinyin + chọn nghĩa đúng (4-6 câu)"
-                                "- Dạng 2: Điền từ vào chỗ trống, sử dụng từ vựng ở HSK level 4 (1-2 câu)"
-                                "- Dạng 3: Sắp xếp hội thoại theo thứ tự đúng (0-1 câu)"
-                                "- Dạng 4: Đọc hiểu văn bản ngắn và trả lời câu hỏi (0-1 câu)"
-                                "Trả về dữ liệu có cấu trúc với: "
-                                "- title: tên bài quiz (dựa trên nội dung ảnh) "
-                                "- questions: danh sách câu hỏi, mỗi câu có các trường tùy theo loại câu hỏi: "
-                                ""
-                                "1. Đối với câu hỏi pinyin và nghĩa (type: 'chinese_to_pinyin_meaning'):"
-                                "  * id: số thứ tự "
-                                "  * type: 'chinese_to_pinyin_meaning' "
-                                "  * question: câu hỏi dạng 'Pinyin và nghĩa của từ [từ tiếng Trung] là gì?' "
-                                "  * chinese_word: từ tiếng Trung (hiển thị cho học sinh) "
-                                "  * pinyin: cách đọc pinyin đúng "
-                                "  * meaning: nghĩa tiếng Việt đúng "
-                                "  * wrong_meanings: 3-4 nghĩa sai để tạo multiple choice "
-                                ""
-                                "2. Đối với câu hỏi điền vào chỗ trống (type: 'gap_filling'):"
-                                "  * id: số thứ tự"
-                                "  * type: 'gap_filling'"
-                                "  * question: Câu hỏi dạng 'Chọn từ phù hợp để điền vào chỗ trống'"
-                                "  * context_sentence: Câu hoàn chỉnh với '___ ' là chỗ cần điền"
-                                "  * options: 4 lựa chọn từ để điền"
-                                "  * correct_answer: Từ đúng để điền vào chỗ trống"
-                                "  * chinese_word: Từ đúng để điền (giống correct_answer)"
-                                "  * pinyin: Pinyin của từ đúng"
-                                "  * meaning: Nghĩa của từ đúng"
-                                "  * hsk_level: 4 (hoặc cấp độ HSK của từ vựng)"
-                                ""
-                                "3. Đối với câu hỏi sắp xếp hội thoại (type: 'dialogue_arrangement'):"
-                                "  * id: số thứ tự"
-                                "  * type: 'dialogue_arrangement'"
-                                "  * question: 'Sắp xếp các phần của hội thoại theo thứ tự đúng'"
-                                "  * dialogue_parts: Mảng các phần của hội thoại (3-5 phần)"
-                                "  * correct_order: Mảng các số nguyên thể hiện thứ tự đúng [0, 1, 2, ...]"
-                                "  * chinese_word: Chủ đề của hội thoại"
-                                "  * pinyin: Pinyin của chủ đề"
-                                "  * meaning: Nghĩa của chủ đề"
-                                ""
-                                "4. Đối với câu hỏi đọc hiểu (type: 'reading_comprehension'):"
-                                "  * id: số thứ tự"
-                                "  * type: 'reading_comprehension'"
-                                "  * question: '阅读理解 (Đọc hiểu)'"
-                                "  * reading_text: Nội dung đoạn văn dài (150-250 từ) bằng tiếng Trung (HSK 4-5), có thể có đoạn văn đối thoại hoặc văn xuôi"
-                                "  * subquestions: Mảng các câu hỏi con bằng tiếng Trung về nội dung đoạn văn (2-4 câu hỏi)"
-                                "  * suboptions: Mảng các mảng lựa chọn bằng tiếng Trung cho từng câu hỏi con"
-                                "  * subanswers: Mảng các đáp án đúng cho từng câu hỏi con"
-                                "  * chinese_word: Tiêu đề của đoạn văn"
-                                "  * pinyin: Pinyin của tiêu đề"
-                                "  * meaning: Nghĩa của tiêu đề"
-                                "  * explanation: Giải thích các từ khó hoặc ngữ pháp phức tạp trong bài đọc"
-                                "  * explanation: giải thích thêm về từ (nếu có) "
-                                "Lưu ý quan trọng:"
-                                "1. Mỗi câu hỏi phải có wrong_meanings riêng biệt, không được sử dụng lại wrong_meanings ở các câu khác"
-                                "2. Các nghĩa sai phải khác hoàn toàn với nghĩa đúng"
-                                "3. Hãy tạo nghĩa sai liên quan đến ngữ cảnh của từ, không chỉ chọn nghĩa ngẫu nhiên"
-                                "4. Tránh sử dụng lại các nghĩa sai giống nhau ở các câu hỏi khác nhau"
-                            )
-                        },
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/png;base64,{base64_img}"
-                            }
-                        }
-                    ]
-                }
-            ]
-        )
-        return quiz_data, image_index, None
+        images = []
+        for image_file in image_files:
+            # Uploads and BytesIO hand back their whole content without moving the file pointer
+            if hasattr(image_file, 'getvalue'):
+                images.append(image_file.getvalue())
+                continue
+            if hasattr(image_file, 'seek'):
+                image_file.seek(0)
+            images.append(image_file.read())
+        
+        cache_key = hashlib.sha256(_PROMPT_FINGERPRINT)
+        for image_bytes in images:
+            cache_key.update(hashlib.sha256(image_bytes).digest())
+        on_questions = None if progress is None else lambda n: progress.__setitem__(first_index, n)
+        results, complete = _cached_generate(cache_key.hexdigest(), tuple(images), on_questions)
+        if not complete:
+            # Don't keep a response with missing or invalid quizzes for a day; retry next time
+            _cached_generate.clear(cache_key.hexdigest(), tuple(images), on_questions)
+        return _with_error_quizzes(results, first_index), first_index, None
     except Exception as e:
-        # Create error question for this image
-        error_question = QuizQuestion(
-            id=1,
-            type="error",
-            question=f"Lỗi khi tạo quiz từ ảnh {image_index+1}: {str(e)}",
-            chinese_word="N/A",
-            pinyin="N/A",
-            meaning="N/A",
-            wrong_meanings=[]
+        error_quizzes = [_error_quiz(first_index + i, str(e)) for i in range(len(image_files))]
+        return error_quizzes, first_index, str(e)
+
+
+@st.cache_resource
+def _request_executor() -> concurrent.futures.ThreadPoolExecutor:
+    """Process-wide worker pool for OpenAI requests
+    
+    Shared by all sessions and reruns, so threads are started once and its size
+    caps the number of requests in flight across the whole server.
+    """
+    return concurrent.futures.ThreadPoolExecutor(
+        max_workers=MAX_CONCURRENT_REQUESTS, thread_name_prefix="quiz-request"
+    )
+
+
+def _run_parallel(fn, arg_tuples, on_poll=None) -> list:
+    """Run fn(*args) for every args tuple on the request pool, returning results in order
+    
+    Every task is submitted before any result is awaited, so the calls always overlap;
+    waiting inside the submit loop would quietly serialize them. `on_poll`, if given,
+    is called from the calling thread with the number of finished and total tasks,
+    at least every PROGRESS_POLL_INTERVAL seconds while tasks are pending.
+    """
+    executor = _request_executor()
+    futures = {executor.submit(fn, *args): i for i, args in enumerate(arg_tuples)}
+    
+    results = [None] * len(futures)
+    pending = set(futures)
+    while pending:
+        done, pending = concurrent.futures.wait(
+            pending, timeout=PROGRESS_POLL_INTERVAL, return_when=concurrent.futures.FIRST_COMPLETED
         )
-        error_quiz = QuizData(questions=[error_question], title=f"Lỗi - Ảnh {image_index+1}")
-        return error_quiz, image_index, str(e)
+        for future in done:
+            results[futures[future]] = future.result()
+        if on_poll is not None:
+            on_poll(len(futures) - len(pending), len(futures))
+    return results
 
 
-def generate_quiz_from_images(image_files):
-    """Generate quiz from multiple images using parallel processing"""
+def generate_quiz_from_images(image_files, on_progress=None):
+    """Generate quiz from multiple images using parallel processing
+    
+    `on_progress`, if given, is called from the calling thread with the total number
+    of questions streamed so far and the fraction of requests finished.
+    """
     if not image_files:
         return None
     
-    with concurrent.futures.ThreadPoolExecutor(max_workers=min(6, len(image_files))) as executor:
-        future_to_index = {
-            executor.submit(generate_single_quiz, image_file, i): i 
-            for i, image_file in enumerate(image_files)
-        }
-        
-        results = {}
-        for future in concurrent.futures.as_completed(future_to_index):
-            quiz_data, image_index, error = future.result()
-            results[image_index] = quiz_data
+    # Several images share one request, and the requests are all dispatched at once
+    # so total latency tracks the slowest call rather than the sum
+    progress = {}
+    chunk_args = [
+        (chunk, i * IMAGES_PER_REQUEST, progress)
+        for i, chunk in enumerate(_chunk_images(image_files))
+    ]
+    on_poll = None if on_progress is None else lambda done, total: on_progress(sum(progress.values()), done / total)
+    
+    results = {}
+    for quizzes, first_index, error in _run_parallel(generate_quiz_chunk, chunk_args, on_poll):
+        for offset, quiz_data in enumerate(quizzes):
+            results[first_index + offset] = quiz_data
     
     # Sort results by original image order
     all_quiz_data = []
@@ -270,56 +560,159 @@ def generate_quiz_from_images(image_files):
         if i in results:
             all_quiz_data.append(results[i])
     
+    return combine_quizzes(all_quiz_data, len(image_files))
+
+
+def submit_quiz_batch(image_files) -> str:
+    """Submit quiz generation for multiple images to the OpenAI Batch API, returning the job id
+
+    Batch jobs cost about half as much as synchronous calls and are not bound by
+    the per-minute request limit, but may take anywhere up to 24 hours to finish,
+    so this only submits the job; collect_quiz_batch picks up the results later.
+    """
+    
+    # One request per chunk of images, using function calling so each result can be parsed into BatchQuizData
+    quiz_tool = {
+        "type": "function",
+        "function": {
+            "name": "BatchQuizData",
+            "description": "Quizzes generated from notes images, one per image",
+            "parameters": BatchQuizData.model_json_schema()
+        }
+    }
+    chunks = _chunk_images(image_files)
+    openai_client = _get_openai_client()
+    lines = []
+    for i, chunk in enumerate(chunks):
+        request = {
+            "custom_id": f"chunk_{i * IMAGES_PER_REQUEST}",
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {
+                "model": QUIZ_MODEL,
+                "temperature": 0.7,
+                "max_tokens": MAX_TOKENS_PER_IMAGE * len(chunk),
+                "messages": _build_messages([prepare_image(image_file) for image_file in chunk]),
+                "tools": [quiz_tool],
+                "tool_choice": {"type": "function", "function": {"name": "BatchQuizData"}}
+            }
+        }
+        lines.append(json.dumps(request, ensure_ascii=False))
+    
+    batch_input = openai_client.files.create(
+        file=("quiz_batch.jsonl", "\n".join(lines).encode("utf-8")),
+        purpose="batch"
+    )
+    batch_job = openai_client.batches.create(
+        input_file_id=batch_input.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h"
+    )
+    return batch_job.id
+
+
+def collect_quiz_batch(batch_id: str, num_images: int) -> tuple[Optional[QuizData], str]:
+    """Check a submitted batch job once, returning (quiz, status)
+
+    The quiz is None while the job is still running.
+    """
+    openai_client = _get_openai_client()
+    batch_job = openai_client.batches.retrieve(batch_id)
+    if batch_job.status not in ("completed", "failed", "expired", "cancelled"):
+        return None, batch_job.status
+    
+    # num_images comes from the URL, so bound it by what the job can actually hold
+    total_requests = batch_job.request_counts.total if batch_job.request_counts else 0
+    num_images = max(1, min(num_images, total_requests * IMAGES_PER_REQUEST))
+    
+    results = {}
+    # Rejected requests are written to the error file instead of the output file,
+    # in the same line format, so both are read to report each chunk's own error
+    for file_id in (batch_job.output_file_id, batch_job.error_file_id):
+        if not file_id:
+            continue
+        output = openai_client.files.content(file_id).text
+        for line in output.splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            first_index = int(record["custom_id"].removeprefix("chunk_"))
+            chunk_size = min(IMAGES_PER_REQUEST, num_images - first_index)
+            if chunk_size <= 0:
+                continue
+            try:
+                if record.get("error"):
+                    raise ValueError(record["error"].get("message", "unknown error"))
+                response = record.get("response") or {}
+                body = response.get("body") or {}
+                if response.get("status_code") != 200:
+                    error = body.get("error") or {}
+                    raise ValueError(error.get("message", f"HTTP {response.get('status_code')}"))
+                message = body["choices"][0]["message"]
+                arguments = message["tool_calls"][0]["function"]["arguments"]
+                items = json.loads(arguments).get("batch") or []
+                quizzes = _with_error_quizzes(_validate_quizzes(items, chunk_size), first_index)
+            except Exception as e:
+                quizzes = [_error_quiz(first_index + i, str(e)) for i in range(chunk_size)]
+            for offset, quiz_data in enumerate(quizzes):
+                results[first_index + offset] = quiz_data
+    
+    # Images missing from both files (failed or expired job) still get an error entry,
+    # with the job-level error if the API gave one
+    missing_reason = f"batch {batch_job.status}"
+    if batch_job.errors and batch_job.errors.data:
+        missing_reason += f": {batch_job.errors.data[0].message}"
+    all_quiz_data = [
+        results[i] if i in results else _error_quiz(i, missing_reason)
+        for i in range(num_images)
+    ]
+    return combine_quizzes(all_quiz_data, num_images), batch_job.status
+
+
+def combine_quizzes(all_quiz_data, num_images):
+    """Merge per-image quizzes into one, renumbering questions and de-duplicating wrong meanings"""
     # Combine all quiz data into one
     if not all_quiz_data:
         return None
     
-    combined_questions = []
+    # Sized up front and filled by index; question ids are 1-based positions in it
+    combined_questions = [None] * sum(len(quiz_data.questions) for quiz_data in all_quiz_data)
     question_id = 1
-    titles = []
+    titles = [quiz_data.title for quiz_data in all_quiz_data]
     
-    # Keep track of used wrong meanings to avoid duplicates
+    # Keep track of used wrong meanings (lowercased) to avoid duplicates
     used_wrong_meanings = set()
     
     for quiz_data in all_quiz_data:
-        titles.append(quiz_data.title)
         for question in quiz_data.questions:
+            correct_lower = question.meaning.lower()
+            
             # Ensure wrong_meanings don't overlap with previously used ones
             filtered_wrong_meanings = []
             for meaning in question.wrong_meanings:
-                if meaning.lower() not in used_wrong_meanings and meaning.lower() != question.meaning.lower():
+                meaning_lower = meaning.lower()
+                if meaning_lower not in used_wrong_meanings and meaning_lower != correct_lower:
                     filtered_wrong_meanings.append(meaning)
-                    used_wrong_meanings.add(meaning.lower())
+                    used_wrong_meanings.add(meaning_lower)
             
-            # Make sure we have at least 3 wrong meanings
-            if len(filtered_wrong_meanings) < 3:
-                # Generate some new meanings that are different from the correct one
-                # and from each other
-                common_wrong_options = [
-                    "học sinh", "giáo viên", "bạn bè", "gia đình", "cuộc sống",
-                    "công việc", "thời gian", "nhà cửa", "tình yêu", "thức ăn",
-                    "nước uống", "sức khỏe", "tiền bạc", "giao thông", "du lịch",
-                    "đi lại", "ngôn ngữ", "học tập", "tình cảm", "hạnh phúc"
-                ]
-                
-                # Add meanings from our common options that don't conflict
-                for meaning in common_wrong_options:
-                    if len(filtered_wrong_meanings) >= 3:
-                        break
-                    if (meaning.lower() not in used_wrong_meanings and 
-                        meaning.lower() != question.meaning.lower() and
-                        meaning not in filtered_wrong_meanings):
-                        filtered_wrong_meanings.append(meaning)
-                        used_wrong_meanings.add(meaning.lower())
+            # Make sure we have at least 3 wrong meanings, adding common options
+            # that differ from the correct one and from every meaning used so far
+            if (missing := 3 - len(filtered_wrong_meanings)) > 0:
+                fill = list(islice(
+                    (m for m in COMMON_WRONG_MEANINGS if m not in used_wrong_meanings and m != correct_lower),
+                    missing,
+                ))
+                filtered_wrong_meanings.extend(fill)
+                used_wrong_meanings.update(fill)
             
-            # Update the question's wrong meanings with our filtered list
+            # Plain attribute writes (validate_assignment is off). The quizzes are fresh copies
+            # from the response cache, and no cached_property has been read on them yet
             question.wrong_meanings = filtered_wrong_meanings
-            
             question.id = question_id
-            combined_questions.append(question)
+            combined_questions[question_id - 1] = question
             question_id += 1
     
-    combined_title = f"Quiz tổng hợp từ {len(image_files)} ảnh: " + ", ".join(titles[:3])
+    combined_title = f"Quiz tổng hợp từ {num_images} ảnh: " + ", ".join(titles[:3])
     if len(titles) > 3:
         combined_title += f" và {len(titles) - 3} ảnh khác"
     
@@ -327,100 +720,176 @@ def generate_quiz_from_images(image_files):
     for question in combined_questions:
         if question.type == "chinese_to_pinyin_meaning" and len(question.wrong_meanings) < 3:
             # Add some generic wrong answers if needed
-            generic_wrong = ["từ khác", "nghĩa khác", "không có nghĩa này", "nghĩa sai"]
-            for wrong in generic_wrong:
+            taken = {m.lower() for m in question.wrong_meanings}
+            taken.add(question.meaning.lower())
+            for wrong in GENERIC_WRONG_MEANINGS:
                 if len(question.wrong_meanings) >= 3:
                     break
-                if wrong.lower() not in [m.lower() for m in question.wrong_meanings] and wrong.lower() != question.meaning.lower():
+                if wrong not in taken:
                     question.wrong_meanings.append(wrong)
+                    taken.add(wrong)
     
-    return QuizData(questions=combined_questions, title=combined_title)
+    # Trusted - instances already validated by instructor, so skip revalidating them
+    return QuizData.model_construct(questions=combined_questions, title=combined_title)
 
 def generate_quiz_from_image(image_file):
     """Generate quiz from single image (kept for backward compatibility)"""
     return generate_quiz_from_images([image_file])
 
-def display_question(question: QuizQuestion, question_num: int) -> bool:
-    """Display a question based on its type"""
+def _remember_option_key(key: str) -> None:
+    """Record a per-question session key so it is dropped when a new quiz is generated"""
+    st.session_state.setdefault("_option_keys", set()).add(key)
+
+def _reset_quiz_state(quiz_data: QuizData) -> None:
+    """Store a freshly generated quiz and clear per-question state left from the previous one"""
+    # Only the keys recorded by the display functions, not a scan of all of session_state
+    for key in st.session_state.pop("_option_keys", set()):
+        st.session_state.pop(key, None)
+    
+    st.session_state.quiz_data = quiz_data
+    # Serialized once per quiz and kept with the session, not in the cross-session cache
+    st.session_state.quiz_json = quiz_data.model_dump_json(indent=2)
+    # question_idx is plain state; question_select belongs to the selectbox, and Streamlit
+    # drops widget-owned keys after any run that doesn't render the widget
+    st.session_state.question_idx = 0
+    st.session_state.question_select = 0
+    # Selectbox labels depend only on the question count, so they are built once per quiz
+    st.session_state.question_labels = tuple(f"Câu {i+1}" for i in range(len(quiz_data.questions)))
+    st.session_state.score = 0
+    # Bit i is set once question i has been answered correctly
+    st.session_state.answered_mask = 0
+
+def _go_to_question(question_idx: int) -> None:
+    """Move to a question, keeping the selectbox in sync with the stored index"""
+    st.session_state.question_idx = question_idx
+    st.session_state.question_select = question_idx
+
+def _prev_question() -> None:
+    """Button callback: go to the previous question"""
+    _go_to_question(max(0, st.session_state.question_idx - 1))
+
+def _next_question(num_questions: int) -> None:
+    """Button callback: go to the next question"""
+    _go_to_question(min(num_questions - 1, st.session_state.question_idx + 1))
+
+def _select_question() -> None:
+    """Selectbox callback: copy the picked question into the stored index"""
+    st.session_state.question_idx = st.session_state.question_select
+
+def _answer_is_correct(question: QuizQuestion) -> bool:
+    """Check the answer currently held in the question's widgets"""
+    state = st.session_state
+    if question.type == "gap_filling":
+        return state.get(f"gap_{question.id}") == question.correct_answer
+    if question.type == "dialogue_arrangement":
+        return state.get(f"dialogue_order_{question.id}") == question.correct_order
+    if question.type == "reading_comprehension":
+        answers = question.subanswers[:len(question.subquestions)]
+        return all(state.get(f"subq_{question.id}_{i}") == answer for i, answer in enumerate(answers))
+    # Pinyin and meaning, also the fallback for any other type
+    pinyin = state.get(f"pinyin_{question.id}", "")
+    return pinyin.strip().lower() == question.pinyin_normalized and state.get(f"meaning_{question.id}") == question.meaning
+
+def _check_answer(question: QuizQuestion, on_correct) -> None:
+    """Check-button callback: report a correct answer before the script reruns"""
+    if on_correct is not None and _answer_is_correct(question):
+        on_correct()
+
+def _record_correct(question_idx: int) -> None:
+    """Count a question as answered correctly, at most once"""
+    mask = st.session_state.answered_mask
+    if not (mask >> question_idx) & 1:
+        st.session_state.answered_mask = mask | (1 << question_idx)
+        st.session_state.score += 1
+
+def _add_dialogue_part(order_key: str, part_idx: int) -> None:
+    """Button callback: append a dialogue part to the arranged order"""
+    st.session_state[order_key].append(part_idx)
+
+def _reset_dialogue_order(order_key: str) -> None:
+    """Button callback: clear the arranged dialogue order"""
+    st.session_state[order_key] = []
+
+def _shuffled_once(question_id: int, kind: str, items: Sequence) -> list:
+    """Shuffle a question's items the first time it is shown and reuse that order on reruns"""
+    key = f"shuffled_{question_id}_{kind}"
+    if (shuffled := st.session_state.get(key)) is None:
+        shuffled = random.sample(items, k=len(items))
+        st.session_state[key] = shuffled
+        _remember_option_key(key)
+    return shuffled
+
+def display_question(question: QuizQuestion, question_num: int, on_correct=None) -> None:
+    """Display a question based on its type
+    
+    `on_correct`, if given, is called from the check button's callback when the
+    submitted answer is right, before the script reruns.
+    """
     st.subheader(f"Câu hỏi {question_num}")
     st.write(f"**Loại:** {question.type}")
     
-    correct = False
-    
     # Handle different question types
     if question.type == "chinese_to_pinyin_meaning":
-        correct = display_pinyin_meaning_question(question, question_num)
+        display_pinyin_meaning_question(question, question_num, on_correct)
     elif question.type == "gap_filling":
-        correct = display_gap_filling_question(question, question_num)
+        display_gap_filling_question(question, question_num, on_correct)
     elif question.type == "dialogue_arrangement":
-        correct = display_dialogue_arrangement_question(question, question_num)
+        display_dialogue_arrangement_question(question, question_num, on_correct)
     elif question.type == "reading_comprehension":
-        correct = display_reading_comprehension_question(question, question_num)
+        display_reading_comprehension_question(question, question_num, on_correct)
     else:
         # Default to pinyin and meaning question type
-        correct = display_pinyin_meaning_question(question, question_num)
+        display_pinyin_meaning_question(question, question_num, on_correct)
     
     st.write("---")
-    return correct
 
-def display_pinyin_meaning_question(question: QuizQuestion, question_num: int) -> bool:
+def display_pinyin_meaning_question(question: QuizQuestion, question_num: int, on_correct=None) -> None:
     """Display a question showing Chinese word and asking for pinyin + meaning"""
     # Display the Chinese word prominently
     st.markdown(f"### 🇨🇳 **{question.chinese_word}**")
     st.write(f"**Câu hỏi:** {question.question}")
     
-    # Create two columns for pinyin input and meaning selection
-    col1, col2 = st.columns([1, 1])
-    
-    with col1:
-        st.write("**1. Nhập pinyin:**")
-        user_pinyin = st.text_input(
-            "Pinyin:",
-            key=f"pinyin_{question.id}",
-            placeholder="Ví dụ: xuéshēng",
-            label_visibility="collapsed"
-        )
-    
-    with col2:
-        st.write("**2. Chọn nghĩa đúng:**")
-        # Get shuffled options for this question instance
-        if f"options_{question.id}" not in st.session_state:
-            # Make sure we have at least 4 options (1 correct + 3 wrong)
-            if len(question.wrong_meanings) < 3:
-                # Add backup options if needed
-                backup_options = ["học sinh", "giáo viên", "bạn bè", "gia đình", "thời gian", "từ khác"]
-                for option in backup_options:
-                    if len(question.wrong_meanings) >= 3:
-                        break
-                    if option.lower() not in [m.lower() for m in question.wrong_meanings] and option.lower() != question.meaning.lower():
-                        question.wrong_meanings.append(option)
-            
-            # Create and shuffle options
-            options = [question.meaning] + question.wrong_meanings[:3]
-            random.shuffle(options)
-            st.session_state[f"options_{question.id}"] = options
-        
-        meaning_options = st.session_state[f"options_{question.id}"]
-        user_meaning = st.radio(
-            "Nghĩa:",
-            meaning_options,
-            key=f"meaning_{question.id}",
-            label_visibility="collapsed"
-        )
+    # Inputs live in a form so typing pinyin doesn't rerun the script on every keystroke
+    with st.form(key=f"q_{question.id}"):
+        # Create two columns for pinyin input and meaning selection
+        col1, col2 = st.columns([1, 1])
         
-        # For debugging, show the number of options
-        st.caption(f"Số lựa chọn: {len(meaning_options)}")
-    
-    correct = False
+        with col1:
+            st.write("**1. Nhập pinyin:**")
+            user_pinyin = st.text_input(
+                "Pinyin:",
+                key=f"pinyin_{question.id}",
+                placeholder="Ví dụ: xuéshēng",
+                label_visibility="collapsed"
+            )
+        
+        with col2:
+            st.write("**2. Chọn nghĩa đúng:**")
+            # Options are shuffled once per question, so reruns keep the same order
+            meaning_options = question.all_meaning_options
+            user_meaning = st.radio(
+                "Nghĩa:",
+                meaning_options,
+                key=f"meaning_{question.id}",
+                label_visibility="collapsed"
+            )
+        
+            # For debugging, show the number of options
+            st.caption(f"Số lựa chọn: {len(meaning_options)}")
+        
+        submitted = st.form_submit_button(
+            f"Kiểm tra câu {question_num}",
+            on_click=_check_answer,
+            args=(question, on_correct)
+        )
     
-    if st.button(f"Kiểm tra câu {question_num}", key=f"check_{question.id}"):
+    if submitted:
         # Check both pinyin and meaning
-        pinyin_correct = user_pinyin.strip().lower() == question.pinyin.strip().lower()
+        pinyin_correct = user_pinyin.strip().lower() == question.pinyin_normalized
         meaning_correct = user_meaning == question.meaning
         
         if pinyin_correct and meaning_correct:
             st.success("✅ Đúng hoàn toàn! Cả pinyin và nghĩa đều chính xác!")
-            correct = True
         elif pinyin_correct and not meaning_correct:
             st.warning(f"⚠️ Pinyin đúng rồi! Nhưng nghĩa sai. Nghĩa đúng là: **{question.meaning}**")
         elif not pinyin_correct and meaning_correct:
@@ -446,10 +915,8 @@ def display_pinyin_meaning_question(question: QuizQuestion, question_num: int) -
         
         if question.explanation:
             st.info(f"💡 **Giải thích:** {question.explanation}")
-    
-    return correct
 
-def display_gap_filling_question(question: QuizQuestion, question_num: int) -> bool:
+def display_gap_filling_question(question: QuizQuestion, question_num: int, on_correct=None) -> None:
     """Display a gap filling question with options"""
     st.markdown(f"### 🇨🇳 Điền từ vào chỗ trống (HSK {question.hsk_level})")
     
@@ -460,25 +927,21 @@ def display_gap_filling_question(question: QuizQuestion, question_num: int) -> b
     # Display options
     st.write("**Chọn từ phù hợp để điền vào chỗ trống:**")
     
-    # Get shuffled options for this question instance
-    if f"gap_options_{question.id}" not in st.session_state:
-        options_copy = question.options.copy()
-        random.shuffle(options_copy)
-        st.session_state[f"gap_options_{question.id}"] = options_copy
-    
     user_answer = st.radio(
         "Lựa chọn:",
-        st.session_state[f"gap_options_{question.id}"],
+        _shuffled_once(question.id, "gap", question.options),
         key=f"gap_{question.id}",
         label_visibility="collapsed"
     )
     
-    correct = False
-    
-    if st.button(f"Kiểm tra câu {question_num}", key=f"check_gap_{question.id}"):
+    if st.button(
+        f"Kiểm tra câu {question_num}",
+        key=f"check_gap_{question.id}",
+        on_click=_check_answer,
+        args=(question, on_correct)
+    ):
         if user_answer == question.correct_answer:
             st.success("✅ Đúng rồi!")
-            correct = True
         else:
             st.error("❌ Sai rồi!")
         
@@ -494,26 +957,24 @@ def display_gap_filling_question(question: QuizQuestion, question_num: int) -> b
         st.write(f"**Từ đúng:** {question.correct_answer}")
         st.write(f"**Pinyin:** {question.pinyin}")
         st.write(f"**Nghĩa:** {question.meaning}")
-    
-    return correct
 
-def display_dialogue_arrangement_question(question: QuizQuestion, question_num: int) -> bool:
+def display_dialogue_arrangement_question(question: QuizQuestion, question_num: int, on_correct=None) -> None:
     """Display a dialogue arrangement question"""
     st.markdown(f"### 🇨🇳 Sắp xếp hội thoại theo thứ tự đúng")
     st.write(f"**{question.question}**")
     
     # Prepare dialogue parts for arrangement
-    if f"dialogue_parts_{question.id}" not in st.session_state:
-        dialogue_parts_with_index = [(i, part) for i, part in enumerate(question.dialogue_parts)]
-        random.shuffle(dialogue_parts_with_index)
-        st.session_state[f"dialogue_parts_{question.id}"] = dialogue_parts_with_index
-        st.session_state[f"dialogue_order_{question.id}"] = []
+    # Only indices are shuffled; the text is looked up in question.dialogue_parts
+    shuffled_parts = _shuffled_once(question.id, "dialogue", range(len(question.dialogue_parts)))
+    order_key = f"dialogue_order_{question.id}"
+    user_order = st.session_state.setdefault(order_key, [])
+    _remember_option_key(order_key)
     
     # Display current order
     st.write("**Đã sắp xếp:**")
-    order_cols = st.columns(len(st.session_state[f"dialogue_order_{question.id}"]) + 1)
+    order_cols = st.columns(len(user_order) + 1)
     
-    for i, idx in enumerate(st.session_state[f"dialogue_order_{question.id}"]):
+    for i, idx in enumerate(user_order):
         with order_cols[i]:
             st.text_area(
                 f"Phần {i+1}",
@@ -525,36 +986,38 @@ def display_dialogue_arrangement_question(question: QuizQuestion, question_num:
     
     # Display remaining parts
     st.write("**Các phần còn lại:**")
-    remaining_parts = [p for p in st.session_state[f"dialogue_parts_{question.id}"] 
-                      if p[0] not in st.session_state[f"dialogue_order_{question.id}"]]
+    remaining_parts = [idx for idx in shuffled_parts 
+                      if idx not in user_order]
     
     if remaining_parts:
         remaining_cols = st.columns(min(3, len(remaining_parts)))
-        for i, (idx, part) in enumerate(remaining_parts):
+        for i, idx in enumerate(remaining_parts):
             with remaining_cols[i % len(remaining_cols)]:
                 st.text_area(
                     f"Phần {i+1}",
-                    part,
+                    question.dialogue_parts[idx],
                     height=100,
                     key=f"remaining_{question.id}_{i}",
                     disabled=True
                 )
-                if st.button(f"Thêm phần này", key=f"add_{question.id}_{i}"):
-                    st.session_state[f"dialogue_order_{question.id}"].append(idx)
-                    st.rerun()
+                st.button(
+                    f"Thêm phần này",
+                    key=f"add_{question.id}_{i}",
+                    on_click=_add_dialogue_part,
+                    args=(order_key, idx)
+                )
     
     # Reset button
-    if st.button("Reset", key=f"reset_{question.id}"):
-        st.session_state[f"dialogue_order_{question.id}"] = []
-        st.rerun()
-    
-    correct = False
+    st.button("Reset", key=f"reset_{question.id}", on_click=_reset_dialogue_order, args=(order_key,))
     
-    if st.button(f"Kiểm tra câu {question_num}", key=f"check_dialogue_{question.id}"):
-        user_order = st.session_state[f"dialogue_order_{question.id}"]
+    if st.button(
+        f"Kiểm tra câu {question_num}",
+        key=f"check_dialogue_{question.id}",
+        on_click=_check_answer,
+        args=(question, on_correct)
+    ):
         if user_order == question.correct_order:
             st.success("✅ Đúng rồi! Bạn đã sắp xếp đúng thứ tự!")
-            correct = True
         else:
             st.error("❌ Sai rồi! Thứ tự đúng là:")
             # Display correct order
@@ -571,10 +1034,8 @@ def display_dialogue_arrangement_question(question: QuizQuestion, question_num:
         
         if question.explanation:
             st.info(f"💡 **Giải thích:** {question.explanation}")
-    
-    return correct
 
-def display_reading_comprehension_question(question: QuizQuestion, question_num: int) -> bool:
+def display_reading_comprehension_question(question: QuizQuestion, question_num: int, on_correct=None) -> None:
     """Display a reading comprehension question with subquestions"""
     st.markdown(f"### 🇨🇳 阅读理解 (Đọc hiểu)")
     
@@ -587,7 +1048,6 @@ def display_reading_comprehension_question(question: QuizQuestion, question_num:
         """, unsafe_allow_html=True)
     
     # Display subquestions (in Chinese)
-    all_correct = True
     user_answers = []
     
     for i, subq in enumerate(question.subquestions):
@@ -605,9 +1065,15 @@ def display_reading_comprehension_question(question: QuizQuestion, question_num:
         
         user_answers.append(user_answer)
     
-    if st.button(f"检查答案 (Kiểm tra)", key=f"check_reading_{question.id}"):
+    if st.button(
+        f"检查答案 (Kiểm tra)",
+        key=f"check_reading_{question.id}",
+        on_click=_check_answer,
+        args=(question, on_correct)
+    ):
         st.write("### 结果 (Kết quả):")
         
+        all_correct = True
         for i, (user_ans, correct_ans) in enumerate(zip(user_answers, question.subanswers)):
             if user_ans == correct_ans:
                 st.success(f"问题 {i+1}: ✅ 正确! (Đúng!)")
@@ -622,8 +1088,63 @@ def display_reading_comprehension_question(question: QuizQuestion, question_num:
         
         if question.explanation:
             st.info(f"💡 **解释 (Giải thích):** {question.explanation}")
+
+@st.fragment(run_every=BATCH_POLL_INTERVAL)
+def _poll_pending_batch() -> None:
+    """Check the submitted batch job on a timer, without blocking the rest of the page"""
+    batch_id, num_images = st.session_state.pending_batch
+    try:
+        quiz_data, status = collect_quiz_batch(batch_id, num_images)
+    except Exception as e:
+        st.warning(f"⚠️ Không kiểm tra được batch {batch_id}: {str(e)}")
+        return
+    
+    if quiz_data is None:
+        st.info(f"⏳ Batch {batch_id} đang xử lý (trạng thái: {status}). Trang sẽ tự cập nhật.")
+        return
+    
+    # Hand the quiz to a full rerun, which installs it before the quiz widgets are created
+    del st.session_state.pending_batch
+    st.query_params.pop("batch", None)
+    st.session_state.batch_result = quiz_data
+    st.rerun()
+
+@st.fragment
+def _render_question(quiz_data: QuizData, question_idx: int) -> None:
+    """Render the current question and the score; answering reruns only this fragment
+    
+    Fragments can't write to the sidebar, so progress is shown here, below the
+    question, where it stays current after every answer.
+    """
+    current_question = quiz_data.questions[question_idx]
+    
+    # Display question; the score is updated by the check buttons' callbacks, not while rendering
+    with st.container():
+        display_question(current_question, question_idx + 1, on_correct=lambda: _record_correct(question_idx))
     
-    return all_correct
+    # Progress and score display
+    answered = st.session_state.answered_mask.bit_count()
+    st.subheader("📊 Tiến độ")
+    st.progress(answered / len(quiz_data.questions))
+    st.write(f"Đã trả lời: {answered}/{len(quiz_data.questions)}")
+    st.write(f"Điểm số: {st.session_state.score}/{answered}")
+
+# Not st.cache_data: that cache is shared by every session, and the only cheap key for a
+# quiz is its id(), which CPython reuses once the object is freed. The per-question text is
+# already cached on each question (text_block), so this is just a join.
+def build_quiz_text(quiz_data: QuizData) -> str:
+    """Render the quiz as downloadable plain text"""
+    parts = [
+        f"QUIZ TITLE: {quiz_data.title}\n"
+        f"Total Questions: {len(quiz_data.questions)}\n\n"
+    ]
+    
+    # Each question formats its own block once; a download only stitches them together
+    parts.extend(
+        f"Question {i}:\n{question.text_block}" for i, question in enumerate(quiz_data.questions, 1)
+    )
+    
+    return "".join(parts)
 
 def main():
     st.set_page_config(
@@ -636,6 +1157,17 @@ def main():
     st.write("Tải lên một hoặc nhiều hình ảnh ghi chú tiếng Trung để tạo quiz tương tác!")
     st.write("**Format:** Hiển thị từ Hán → Học sinh điền pinyin + chọn nghĩa")
     
+    # A finished batch job is installed here, before any quiz widget exists in this run
+    if (batch_quiz := st.session_state.pop("batch_result", None)) is not None:
+        _reset_quiz_state(batch_quiz)
+        st.success(f"✅ Batch đã hoàn thành với tổng cộng {len(batch_quiz.questions)} câu hỏi!")
+    if "pending_batch" not in st.session_state and "batch" in st.query_params:
+        batch_id, _, num_images = st.query_params["batch"].rpartition(":")
+        if batch_id and num_images.isdigit():
+            st.session_state.pending_batch = (batch_id, int(num_images))
+    if "pending_batch" in st.session_state:
+        _poll_pending_batch()
+    
     # Sidebar for file upload
     st.sidebar.header("🖼️ Tải lên hình ảnh")
     uploaded_files = st.sidebar.file_uploader(
@@ -648,6 +1180,12 @@ def main():
     # Option to use default image
     use_default = st.sidebar.checkbox("Sử dụng hình ảnh mẫu (A.jpg)")
     
+    # Batch mode trades latency (up to a day) for cost, so it is strictly opt-in
+    use_batch = st.sidebar.checkbox(
+        "Chế độ batch (rẻ hơn, chậm hơn)",
+        help="Dùng OpenAI Batch API: giảm khoảng 50% chi phí nhưng có thể mất tới 24 giờ để hoàn thành"
+    )
+    
     if uploaded_files or use_default:
         # Display uploaded images
         col1, col2 = st.columns([1, 2])
@@ -658,27 +1196,48 @@ def main():
             
             if uploaded_files:
                 for i, uploaded_file in enumerate(uploaded_files):
-                    image = Image.open(uploaded_file)
-                    st.image(image, caption=f"Ảnh {i+1}: {uploaded_file.name}", use_container_width=True)
+                    # Cached preview, so reruns don't decode every upload again
+                    st.image(_thumbnail_png(uploaded_file.getvalue()), caption=f"Ảnh {i+1}: {uploaded_file.name}", use_container_width=True)
                     image_files.append(uploaded_file)
                 st.write(f"**Tổng cộng: {len(uploaded_files)} ảnh**")
             elif use_default:
                 try:
-                    with open("A.jpg", "rb") as f:
-                        image = Image.open("A.jpg")
-                        st.image(image, caption="Hình ảnh mẫu (A.jpg)", use_container_width=True)
-                        # Reset file pointer for processing
-                        image_files = [open("A.jpg", "rb")]
+                    image_bytes = _load_default_image()
+                    st.image(_thumbnail_png(image_bytes), caption="Hình ảnh mẫu (A.jpg)", use_container_width=True)
+                    # In-memory copy for processing, named like an upload
+                    default_file = io.BytesIO(image_bytes)
+                    default_file.name = "A.jpg"
+                    image_files = [default_file]
                 except FileNotFoundError:
                     st.error("Không tìm thấy file A.jpg!")
                     return
         
         with col2:
             # Generate quiz button
-            if st.button("🎯 Tạo Quiz", type="primary"):
-                # Show progress bar and status
-                progress_bar = st.progress(0)
-                status_text = st.empty()
+            generate = st.button("🎯 Tạo Quiz", type="primary")
+            files = uploaded_files if uploaded_files else image_files
+            
+            if generate and use_batch:
+                # Only the job id is kept; _poll_pending_batch checks it on later reruns,
+                # so the script never blocks while the job runs
+                if "pending_batch" in st.session_state:
+                    st.warning("⚠️ Đang có một batch chưa hoàn thành. Vui lòng đợi batch đó xong!")
+                else:
+                    try:
+                        with st.spinner("Đang gửi batch..."):
+                            batch_id = submit_quiz_batch(files)
+                        st.session_state.pending_batch = (batch_id, len(files))
+                        # Also in the URL, since a browser refresh starts a new session
+                        st.query_params["batch"] = f"{batch_id}:{len(files)}"
+                    except Exception as e:
+                        st.error(f"❌ Lỗi khi gửi batch: {str(e)}")
+                    else:
+                        # The poller is only started near the top of main, so rerun to register it now
+                        st.rerun()
+            
+            elif generate:
+                # One placeholder for progress; it stays empty until there is something to report
+                progress_area = st.empty()
                 
                 with st.spinner("Đang tạo quiz... Vui lòng đợi!"):
                     try:
@@ -686,41 +1245,26 @@ def main():
                         
                         start_time = time.time()
                         
-                        # Reset file pointers if using uploaded files
-                        if uploaded_files:
-                            for uploaded_file in uploaded_files:
-                                uploaded_file.seek(0)
-                            quiz_data = generate_quiz_from_images(uploaded_files)
-                        else:
-                            quiz_data = generate_quiz_from_images(image_files)
+                        def show_progress(num_questions, fraction_done):
+                            progress_area.progress(fraction_done, text=f"Đã nhận {num_questions} câu hỏi...")
+                        
+                        quiz_data = generate_quiz_from_images(files, on_progress=show_progress)
                         
                         end_time = time.time()
                         processing_time = end_time - start_time
                         
-                        progress_bar.progress(1.0)
+                        progress_area.empty()
                         
                         if quiz_data is None:
                             st.error("Không thể tạo quiz từ các ảnh đã tải!")
                             return
                         
-                        st.session_state.quiz_data = quiz_data
-                        st.session_state.current_question = 0
-                        st.session_state.score = 0
-                        st.session_state.answered_questions = set()
-                        
-                        # Clear any previous question options
-                        for key in list(st.session_state.keys()):
-                            if key.startswith("options_"):
-                                del st.session_state[key]
-                        
-                        status_text.empty()
-                        progress_bar.empty()
+                        _reset_quiz_state(quiz_data)
                         
                         st.success(f"✅ Quiz đã được tạo từ {num_images} ảnh với tổng cộng {len(quiz_data.questions)} câu hỏi!")
                         
                     except Exception as e:
-                        progress_bar.empty()
-                        status_text.empty()
+                        progress_area.empty()
                         st.error(f"❌ Lỗi khi tạo quiz: {str(e)}")
     
     # Display quiz if available
@@ -733,96 +1277,53 @@ def main():
         # Quiz navigation
         col1, col2, col3 = st.columns([1, 2, 1])
         
+        # Buttons move the index in callbacks, which run before the rerun, so no st.rerun() is needed
         with col1:
-            if st.button("⬅️ Câu trước") and st.session_state.current_question > 0:
-                st.session_state.current_question -= 1
-                st.rerun()
+            st.button(
+                "⬅️ Câu trước",
+                on_click=_prev_question,
+                disabled=st.session_state.question_idx == 0
+            )
         
         with col2:
-            question_options = [f"Câu {i+1}" for i in range(len(quiz_data.questions))]
-            selected_q = st.selectbox(
+            # Options are the question indices themselves. The widget's own key is restored
+            # from question_idx if Streamlit dropped it during a run that skipped the widget
+            if "question_select" not in st.session_state:
+                st.session_state.question_select = st.session_state.question_idx
+            st.selectbox(
                 "Chọn câu hỏi:",
-                question_options,
-                index=st.session_state.current_question
+                range(len(quiz_data.questions)),
+                key="question_select",
+                on_change=_select_question,
+                format_func=st.session_state.question_labels.__getitem__
             )
-            st.session_state.current_question = question_options.index(selected_q)
         
         with col3:
-            if st.button("Câu sau ➡️") and st.session_state.current_question < len(quiz_data.questions) - 1:
-                st.session_state.current_question += 1
-                st.rerun()
+            st.button(
+                "Câu sau ➡️",
+                on_click=_next_question,
+                args=(len(quiz_data.questions),),
+                disabled=st.session_state.question_idx >= len(quiz_data.questions) - 1
+            )
         
-        # Display current question
-        current_q_idx = st.session_state.current_question
-        current_question = quiz_data.questions[current_q_idx]
-        
-        # Display question
-        with st.container():
-            is_correct = display_question(current_question, current_q_idx + 1)
-            
-            # Update score tracking
-            if is_correct and current_q_idx not in st.session_state.answered_questions:
-                st.session_state.score += 1
-                st.session_state.answered_questions.add(current_q_idx)
-        
-        # Progress and score display
-        st.sidebar.header("📊 Tiến độ")
-        progress = len(st.session_state.answered_questions) / len(quiz_data.questions)
-        st.sidebar.progress(progress)
-        st.sidebar.write(f"Đã trả lời: {len(st.session_state.answered_questions)}/{len(quiz_data.questions)}")
-        st.sidebar.write(f"Điểm số: {st.session_state.score}/{len(st.session_state.answered_questions) if st.session_state.answered_questions else 0}")
+        # Display current question; its widgets rerun only the fragment, not the whole page
+        _render_question(quiz_data, st.session_state.question_idx)
         
         # Download quiz option
         st.sidebar.header("💾 Tải xuống")
-        if st.sidebar.button("📄 Tải quiz dạng text"):
-            quiz_text = f"QUIZ TITLE: {quiz_data.title}\n"
-            quiz_text += f"Total Questions: {len(quiz_data.questions)}\n\n"
-            
-            for i, question in enumerate(quiz_data.questions, 1):
-                quiz_text += f"Question {i}:\n"
-                quiz_text += f"Type: {question.type}\n"
-                quiz_text += f"Chinese Word: {question.chinese_word}\n"
-                quiz_text += f"Question: {question.question}\n"
-                quiz_text += f"Correct Pinyin: {question.pinyin}\n"
-                quiz_text += f"Correct Meaning: {question.meaning}\n"
-                
-                # Type-specific fields
-                if question.type == "chinese_to_pinyin_meaning":
-                    quiz_text += f"Wrong Options: {', '.join(question.wrong_meanings)}\n"
-                
-                elif question.type == "gap_filling":
-                    quiz_text += f"Context Sentence: {question.context_sentence}\n"
-                    quiz_text += f"Options: {', '.join(question.options)}\n"
-                    quiz_text += f"Correct Answer: {question.correct_answer}\n"
-                    quiz_text += f"HSK Level: {question.hsk_level}\n"
-                
-                elif question.type == "dialogue_arrangement":
-                    quiz_text += "Dialogue Parts:\n"
-                    for j, part in enumerate(question.dialogue_parts):
-                        quiz_text += f"  Part {j+1}: {part}\n"
-                    quiz_text += f"Correct Order: {question.correct_order}\n"
-                
-                elif question.type == "reading_comprehension":
-                    quiz_text += "Reading Text:\n"
-                    quiz_text += f"{question.reading_text}\n\n"
-                    quiz_text += "Subquestions:\n"
-                    for j, (subq, ans) in enumerate(zip(question.subquestions, question.subanswers)):
-                        quiz_text += f"  {j+1}. {subq}\n"
-                        quiz_text += f"     Answer: {ans}\n"
-                        if j < len(question.suboptions):
-                            quiz_text += f"     Options: {', '.join(question.suboptions[j])}\n"
-                
-                if question.explanation:
-                    quiz_text += f"Explanation: {question.explanation}\n"
-                
-                quiz_text += "-" * 40 + "\n"
-            
-            st.sidebar.download_button(
-                label="📥 Download Quiz",
-                data=quiz_text,
-                file_name="quiz_output.txt",
-                mime="text/plain"
-            )
+        # Rendered directly; the text is assembled from per-question blocks, so this is cheap on every rerun
+        st.sidebar.download_button(
+            label="📥 Download Quiz",
+            data=build_quiz_text(quiz_data),
+            file_name="quiz_output.txt",
+            mime="text/plain"
+        )
+        st.sidebar.download_button(
+            label="📥 Download JSON",
+            data=st.session_state.quiz_json,
+            file_name="quiz_output.json",
+            mime="application/json"
+        )
     else:
         st.info("Chopchop hoc tieng trung di")
 